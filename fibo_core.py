@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from numba import njit, types
+
+try:
+    import numexpr
+except ImportError:  # Optional, only used to speed up wide column searches
+    numexpr = None
+
+# Fibonacci ratios and their labels (computed once at import)
+_RETR = np.array([0.236, 0.382, 0.5, 0.618, 0.786])
+_EXT = np.array([1.0, 1.236, 1.382, 1.5, 1.618, 1.786, 2.0, 2.618])
+_RETR_LABELS = [f"Retracement {int(ratio * 100)}%" for ratio in _RETR]
+_EXT_LABELS = [f"Extension {int(ratio * 100)}%" for ratio in _EXT]
+
+# Kernel input type: pandas may hand out read-only views (copy-on-write); writable arrays match too
+_CLOSE_ARRAY = types.Array(types.float64, 1, 'A', readonly=True)
+
+# Minimum number of searched columns for which the numexpr path pays off
+_NUMEXPR_MIN_COLS = 4
+
+# Function to calculate Fibonacci levels
+@st.cache_data
+def calculate_fibonacci_levels(high, low):
+    rng = high - low
+    retracement_levels = low + rng * _RETR
+    extension_levels = high + rng * (_EXT - 1)
+    return dict(zip(_RETR_LABELS, retracement_levels.tolist())) | dict(zip(_EXT_LABELS, extension_levels.tolist()))
+
+# Function to search for a value within a tolerance
+def search_value_in_columns(data, value, tolerance, cols_to_search, numeric_cols):
+    lo, hi = value - tolerance, value + tolerance
+    cols = [col for col in cols_to_search if col in numeric_cols]  # Skip non-numeric columns
+
+    if numexpr is not None and len(cols) >= _NUMEXPR_MIN_COLS:
+        # Evaluate all columns in one multi-threaded, block-wise numexpr expression
+        # (columns are bound to c0, c1, ... since their names are not valid identifiers)
+        local_dict = {f"c{i}": data[col].to_numpy(dtype=np.float64, na_value=np.nan) for i, col in enumerate(cols)}
+        expr = " | ".join(f"((c{i} >= lo) & (c{i} <= hi))" for i in range(len(cols)))
+        mask = numexpr.evaluate(expr, local_dict={**local_dict, "lo": lo, "hi": hi})
+    else:
+        # OR each column's match into one preallocated mask instead of copying the columns into a 2-D block
+        mask = np.zeros(len(data), dtype=bool)
+        for col in cols:
+            values = data[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            np.logical_or(mask, (values >= lo) & (values <= hi), out=mask)
+
+    return data.iloc[mask] if mask.any() else data.iloc[:0]
+
+# Wilder's RSI in a single pass over the close prices
+@njit(types.float64[:](_CLOSE_ARRAY, types.int64), cache=True)
+def _rsi_wilder(close, period):
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if n <= period:
+        return out
+
+    # Seed the averages with the simple mean of the first `period` gains and losses
+    # (no fastmath here: it lets LLVM assume there are no NaNs, and a NaN Close must be skipped)
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, period + 1):
+        delta = close[i] - close[i - 1]
+        if delta != delta:
+            continue  # Skip deltas next to a missing Close
+        if delta > 0:
+            avg_gain += delta
+        else:
+            avg_loss -= delta
+    avg_gain /= period
+    avg_loss /= period
+    # Handle the case where avg_loss is zero to avoid division by zero
+    out[period] = 100 - 100 / (1 + avg_gain / (avg_loss if avg_loss else 1e-9))
+
+    # Wilder's smoothing for the remaining rows
+    for i in range(period + 1, n):
+        delta = close[i] - close[i - 1]
+        if delta != delta:
+            continue  # Leave RSI as NaN and keep the averages unchanged
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+        out[i] = 100 - 100 / (1 + avg_gain / (avg_loss if avg_loss else 1e-9))
+
+    return out
+
+# Function to calculate RSI manually
+def calculate_rsi(data, period=14):
+    rsi = _rsi_wilder(data.to_numpy(dtype=np.float64), period)
+    return pd.Series(rsi, index=data.index)
+
+# One ewm(adjust=False) step: `weight` is the weight of the previous EMA, which decays
+# over missing closes so the next observation is weighted like pandas does
+@njit(cache=True)
+def _ema_update(ema, weight, x, alpha):
+    if ema != ema:
+        # No observation yet, start from the first available close
+        return x, 1.0
+    weight *= 1 - alpha
+    if x == x:
+        if ema != x:
+            ema = (weight * ema + alpha * x) / (weight + alpha)
+        weight = 1.0
+    return ema, weight
+
+# EMA5, EMA14 and EMA26 in a single pass over the close prices
+@njit(types.UniTuple(types.float64[:], 3)(_CLOSE_ARRAY, types.float64, types.float64, types.float64), cache=True)
+def _ema_triple(close, alpha5, alpha14, alpha26):
+    n = close.shape[0]
+    ema5 = np.empty(n)
+    ema14 = np.empty(n)
+    ema26 = np.empty(n)
+    if n == 0:
+        return ema5, ema14, ema26
+
+    # Same recursion as pandas ewm(adjust=False), seeded with the first close; a missing
+    # close carries the previous EMA forward (no fastmath, so the NaN checks are kept)
+    s5 = s14 = s26 = close[0]
+    w5 = w14 = w26 = 1.0
+    ema5[0] = s5
+    ema14[0] = s14
+    ema26[0] = s26
+    for i in range(1, n):
+        x = close[i]
+        s5, w5 = _ema_update(s5, w5, x, alpha5)
+        s14, w14 = _ema_update(s14, w14, x, alpha14)
+        s26, w26 = _ema_update(s26, w26, x, alpha26)
+        ema5[i] = s5
+        ema14[i] = s14
+        ema26[i] = s26
+
+    return ema5, ema14, ema26
+
+# Function to calculate the difference and percentage change from the previous row in one pass
+def _diff_and_pct_change(values):
+    diff = np.empty_like(values)
+    pct = np.full_like(values, np.nan)
+    diff[:1] = np.nan
+    np.subtract(values[1:], values[:-1], out=diff[1:])
+
+    # Leave the percentage change as NaN where the previous value is zero
+    previous = values[:-1]
+    np.divide(diff[1:], previous, out=pct[1:], where=previous != 0)
+    pct *= 100
+
+    return diff, pct
+
+# Function to add RSI, EMAs and difference columns to downloaded stock data
+def enrich(stock_data):
+    # Move the Date index into a column, keeping it datetime64 for Plotly and st.dataframe
+    stock_data = stock_data.reset_index()
+
+    # Calculate the difference and percentage change from the previous day's Close
+    price_diff, price_pct = _diff_and_pct_change(stock_data['Close'].to_numpy(dtype=np.float64))
+    stock_data['% Difference'] = price_pct
+    stock_data['Price Difference'] = price_diff
+
+    # Calculate Volume Difference in millions (absolute volume difference in millions)
+    volume_diff, volume_pct = _diff_and_pct_change(stock_data['Volume'].to_numpy(dtype=np.float64))
+    stock_data['Volume Difference'] = volume_diff / 1e6  # Difference in millions
+    stock_data['% Volume Difference'] = volume_pct
+
+    # Calculate RSI manually
+    stock_data['RSI'] = calculate_rsi(stock_data['Close'], period=14)
+
+    # Calculate EMAs (alpha = 2 / (span + 1))
+    ema5, ema14, ema26 = _ema_triple(stock_data['Close'].to_numpy(dtype=np.float64), 2 / 6, 2 / 15, 2 / 27)
+    stock_data = stock_data.assign(EMA5=ema5, EMA14=ema14, EMA26=ema26)
+
+    # Format all numeric columns to two decimal places in one pass (Date is left as is)
+    num_cols = stock_data.select_dtypes(include=np.number).columns
+    stock_data[num_cols] = stock_data[num_cols].round(2)
+
+    # Store the result Arrow-backed so st.dataframe does not convert it on every rerun; float
+    # columns are cast explicitly so whole-number or all-missing ones do not become int64
+    float_cols = stock_data.select_dtypes(include='float').columns
+    stock_data = stock_data.convert_dtypes(dtype_backend="pyarrow").astype(
+        {col: pd.ArrowDtype(pa.float64()) for col in float_cols}
+    )
+
+    return stock_data
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from fibo_core import calculate_rsi, enrich
+
+
+# Close prices oscillating around a DAX-like level
+def _close_prices(n=60):
+    steps = np.arange(n, dtype=np.float64)
+    return pd.Series(18000 + 40 * np.sin(steps / 3) + steps)
+
+
+# Downloaded-looking stock data with a Date index
+def _stock_data(close):
+    index = pd.date_range("2024-01-01", periods=len(close), freq="B", name="Date")
+    return pd.DataFrame({
+        'Open': close.to_numpy(),
+        'High': close.to_numpy() + 20,
+        'Low': close.to_numpy() - 20,
+        'Close': close.to_numpy(),
+        'Volume': np.full(len(close), 1_000_000),
+    }, index=index)
+
+
+def test_rsi_skips_a_missing_close():
+    close = _close_prices()
+    close[30] = np.nan
+
+    rsi = calculate_rsi(close, period=14)
+
+    # Both deltas next to the missing Close are skipped, every other row has a value
+    assert rsi.iloc[30:32].isna().all()
+    assert rsi.iloc[14:30].notna().all()
+    assert rsi.iloc[32:].notna().all()
+    assert rsi.dropna().between(0, 100).all()
+
+
+def test_emas_match_pandas_ewm_with_a_missing_close():
+    close = _close_prices()
+    close[30] = np.nan
+
+    stock_data = enrich(_stock_data(close))
+
+    for span in (5, 14, 26):
+        expected = close.ewm(span=span, adjust=False).mean().round(2)
+        actual = stock_data[f'EMA{span}'].to_numpy(dtype=np.float64, na_value=np.nan)
+        np.testing.assert_allclose(actual, expected.to_numpy(), atol=1e-9)
+
+
+@pytest.mark.parametrize("n, volume", [(60, 0), (10, 1_000_000)])
+def test_enrich_keeps_float_columns_double(n, volume):
+    # Whole-number prices, a zero Volume or too few rows for an RSI must not turn floats into int64
+    close = pd.Series(np.arange(18000, 18000 + n, dtype=np.float64))
+    data = _stock_data(close)
+    data['Volume'] = volume
+
+    stock_data = enrich(data)
+
+    float_cols = ['Open', 'High', 'Low', 'Close', '% Difference', 'Price Difference',
+                  'Volume Difference', '% Volume Difference', 'RSI', 'EMA5', 'EMA14', 'EMA26']
+    for col in float_cols:
+        assert stock_data[col].dtype == pd.ArrowDtype(pa.float64()), col
+    assert stock_data['Volume'].dtype == pd.ArrowDtype(pa.int64())